@@ -0,0 +1,25 @@
+# _jsonl.py
+# analyse_logs_*.py 共用的 JSONL 读取工具
+import json
+
+# 可选：orjson 解析更快（C 实现）；未安装时退回标准库
+try:
+    import orjson
+    loads = orjson.loads
+except ImportError:
+    loads = json.loads
+
+CHUNK_SIZE = 1 << 20  # 每次读取 1 MiB
+
+def iter_lines(f):
+    """按块读取二进制文件并用 bytes.split 切行（切分在 C 层完成）。"""
+    tail = b""
+    while True:
+        chunk = f.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        lines = (tail + chunk).split(b"\n")
+        tail = lines.pop()
+        yield from lines
+    if tail:
+        yield tail
@@ -0,0 +1,29 @@
+# adapters/http_pool.py
+from __future__ import annotations
+
+from typing import Any
+
+
+def pooled_http_client(
+    timeout: float = 120,
+    *,
+    max_keepalive_connections: int = 32,
+    max_connections: int = 64,
+    **kwargs: Any,
+):
+    """
+    构造带 keep-alive 连接池的 httpx.Client，供 Letta / Mem0 SDK 复用。
+    - 同一进程内的 create/list/delete 复用 TCP+TLS 连接，省去每次握手
+    - 安装了 h2 时启用 HTTP/2（多路复用）；否则退回 HTTP/1.1
+    """
+    import httpx  # letta-client / mem0ai 均依赖 httpx
+
+    limits = httpx.Limits(
+        max_keepalive_connections=max_keepalive_connections,
+        max_connections=max_connections,
+    )
+    try:
+        return httpx.Client(http2=True, limits=limits, timeout=timeout, **kwargs)
+    except ImportError:
+        # http2=True 需要 `pip install httpx[http2]`
+        return httpx.Client(limits=limits, timeout=timeout, **kwargs)
@@ -2,10 +2,15 @@
 from __future__ import annotations
 
 import os
+import asyncio
+import threading
 import datetime as dt
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any, Optional
 
 from .base import MemoryAdapter, Op
+from .http_pool import pooled_http_client
 
 # --- Letta SDK ---
 # 建议：pip install letta-client
@@ -14,6 +19,54 @@ try:
 except Exception:
     Letta = None
 
+# search() 游标缓存上限：(query, page_size, page) -> 该页最后一条 passage id
+_CURSOR_CACHE_SIZE = 1024
+
+
+_fromisoformat = dt.datetime.fromisoformat
+
+
+def _fact_to_passage_text(f: Dict[str, Any]) -> str:
+    s = f.get("subject", "")
+    p = f.get("predicate", "")
+    o = f.get("object", "")
+    ts = f.get("ts", "")
+    src = f.get("source", "")
+    return f"{s} {p} {o} | ts={ts} | src={src}"
+
+
+def _passage_kwargs(f: Dict[str, Any]) -> Dict[str, Any]:
+    """结构化事实 -> agents.passages.create 的参数（agent_id 除外）。"""
+    ts = f.get("ts")
+    created_at: Optional[dt.datetime] = None
+    # 至少要有 YYYY-MM-DD 才尝试解析，明显不合法的值不进入 fromisoformat
+    if isinstance(ts, str) and len(ts) >= 10:
+        try:
+            created_at = _fromisoformat(ts)
+        except ValueError:
+            created_at = None
+    return {
+        "text": _fact_to_passage_text(f),
+        "tags": list(f.get("tags") or ()) or None,   # tags 可能是共享的 tuple
+        "created_at": created_at,
+    }
+
+
+def _passage_to_dict(p: Any) -> Dict[str, Any]:
+    """SDK Passage -> 可 JSON 序列化的 dict（datetime -> ISO 字符串）。"""
+    created_at = getattr(p, "created_at", None)
+    updated_at = getattr(p, "updated_at", None)
+    if hasattr(created_at, "isoformat"):
+        created_at = created_at.isoformat()
+    if hasattr(updated_at, "isoformat"):
+        updated_at = updated_at.isoformat()
+    return {
+        "id": getattr(p, "id", None),
+        "text": getattr(p, "text", None),
+        "created_at": created_at,
+        "updated_at": updated_at,
+    }
+
 
 class LettaAdapter(MemoryAdapter):
     """
@@ -21,8 +74,12 @@ class LettaAdapter(MemoryAdapter):
 
     主要功能：
       - write(facts): 结构化事实 -> 文本 passage -> 写入 Letta (agents.passages.create)
-      - search(query): 通过 Letta 的分页接口做游标推进，返回指定页的前 k 条
+      - awrite(facts): write 的异步版本，按 max_concurrency 并发发起 create 请求
+      - write_batch(records) / flush(): 缓冲写入，攒满 chunk_size 条再整块写出（异步版 awrite_batch / aflush）
+      - asearch / adelete: search / delete 的异步版本（在线程中执行同步 SDK 调用）
+      - search(query): 游标分页（after=上一页末条 id），缓存各页游标，第 N 页通常只需 1 次请求
       - delete(memory_id): 删除 passage（用于清理）
+      - close(): 释放同步写入使用的线程池
       - update(patch): （可选）REST 兜底 PATCH 文本；或采用上层 delete+create
 
     必需环境变量（若未手动传入 sdk_client/agent_id）：
@@ -41,9 +98,11 @@ class LettaAdapter(MemoryAdapter):
         *,
         agent_id: Optional[str] = None,
         timeout: int = 120,
+        max_concurrency: int = 8,                    # 写入时同时在途的 create 请求上限
         use_rest_fallback_for_update: bool = False,  # 基础评测不需要修改，可关闭
     ):
         self.timeout = timeout
+        self.max_concurrency = max(1, int(max_concurrency))
         self.agent_id = agent_id or os.getenv("LETTA_AGENT_ID")
 
         # 1) 构造/注入 SDK 客户端
@@ -58,106 +117,206 @@ class LettaAdapter(MemoryAdapter):
             token = os.getenv("LETTA_TOKEN") or os.getenv("LETTA_API_KEY")
             if not project or not token:
                 raise RuntimeError("缺少 LETTA_PROJECT / LETTA_TOKEN 环境变量（或在构造函数传入 sdk_client）。")
-            self.client = Letta(project=project, token=token)
+            # 共享 keep-alive 连接池，避免每次请求重新握手
+            self.client = Letta(project=project, token=token, httpx_client=pooled_http_client(self.timeout))
 
         if not self.agent_id:
             raise RuntimeError("必须提供 LETTA_AGENT_ID（或在构造函数传入 agent_id）。")
 
+        # search() 的页游标缓存（LRU）；写入/删除后清空。asearch 会在多个线程中访问，需加锁
+        self._cursor_cache: "OrderedDict[tuple, str]" = OrderedDict()
+        self._cursor_lock = threading.Lock()
+        # write_batch() 尚未写出的事实
+        self._pending: List[Dict[str, Any]] = []
+        # 同步 write() 使用的常驻线程池（首次写入时创建，跨调用复用）
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+
         # 2) 可选：REST 兜底（仅用于 update 文本）
         self._rest_enabled = False
         if use_rest_fallback_for_update:
             base = os.getenv("LETTA_API_BASE", "").rstrip("/")
             api_key = os.getenv("LETTA_API_KEY") or os.getenv("LETTA_TOKEN")
             if base and api_key:
-                import requests
-
                 self._rest_enabled = True
                 self._rest_base = base
-                self._rest = requests.Session()
-                self._rest.headers.update(
-                    {
+                # 复用 httpx 连接池；HTTP/2 下并发 update 共享同一 TCP+TLS 会话
+                self._rest = pooled_http_client(
+                    self.timeout,
+                    max_keepalive_connections=8,
+                    headers={
                         "Authorization": f"Bearer {api_key}",
                         "Content-Type": "application/json",
-                    }
+                    },
                 )
 
     # ---------------- 写入（Create Passage） ----------------
     def write(self, facts: List[Dict[str, Any]], *, scope: str = "long_term") -> None:
         """
         将结构化事实写入 Letta 归档记忆（passages）。
+        同步路径：在适配器持有的常驻线程池（max_concurrency 个线程）上并发 create，
+        不再每次调用都新建/销毁事件循环与默认线程池；在运行中的事件循环里调用也安全（阻塞至写完）。
+        异步代码中请直接 await awrite()。
         """
         if scope != "long_term" or not facts:
             return
+        payloads = [_passage_kwargs(f) for f in facts]
+        list(self._executor().map(self._create_passage, payloads))
+        with self._cursor_lock:
+            self._cursor_cache.clear()
 
-        def _to_text(f: Dict[str, Any]) -> str:
-            s = f.get("subject", "")
-            p = f.get("predicate", "")
-            o = f.get("object", "")
-            ts = f.get("ts", "")
-            src = f.get("source", "")
-            return f"{s} {p} {o} | ts={ts} | src={src}"
-
-        for f in facts:
-            text = _to_text(f)
-            tags = f.get("tags")
-            created_at: Optional[dt.datetime] = None
-            if f.get("ts"):
-                try:
-                    created_at = dt.datetime.fromisoformat(f["ts"])
-                except Exception:
-                    created_at = None
-
-            # Letta SDK: agents.passages.create(...)
-            self.client.agents.passages.create(
-                agent_id=self.agent_id,
-                text=text,
-                tags=tags if tags else None,
-                created_at=created_at if created_at else None,
-            )
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.max_concurrency, thread_name_prefix="letta-write"
+                )
+            return self._pool
+
+    def close(self) -> None:
+        """释放同步写入的线程池（可选；进程退出时也会自动回收）。"""
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+    def _create_passage(self, kwargs: Dict[str, Any]) -> None:
+        # Letta SDK: agents.passages.create(...)
+        self.client.agents.passages.create(agent_id=self.agent_id, **kwargs)
+
+    async def awrite(self, facts: List[Dict[str, Any]], *, scope: str = "long_term") -> None:
+        """
+        并发写入：每条事实一次 create 请求，用 Semaphore 限制在途数量。
+        写入耗时从 sum(latency) 降到约 max(latency) × ceil(N / max_concurrency)。
+        """
+        if scope != "long_term" or not facts:
+            return
+
+        # 先在事件循环外把每条事实转成 create 参数，线程里只剩网络调用
+        payloads = [_passage_kwargs(f) for f in facts]
+        sem = asyncio.Semaphore(self.max_concurrency)
+
+        async def _create(kwargs: Dict[str, Any]) -> None:
+            # 注入的通常是同步客户端，放到线程里执行以便并发
+            async with sem:
+                await asyncio.to_thread(self._create_passage, kwargs)
+
+        await asyncio.gather(*(_create(kw) for kw in payloads))
+        # 新 passage 可能改变分页边界
+        with self._cursor_lock:
+            self._cursor_cache.clear()
+
+    def write_batch(
+        self,
+        records: List[Dict[str, Any]],
+        *,
+        scope: str = "long_term",
+        chunk_size: int = 128,
+    ) -> None:
+        """
+        缓冲写入：records 先进入待写队列，每攒满 chunk_size 条整块写出（块内并发）。
+        不足一块的剩余部分留在队列中，需由调用方在结束时 flush()。
+        Letta 没有批量创建 passage 的接口，故每块仍是逐条 create，只是一次性并发发出。
+        """
+        for chunk in self._enqueue(records, scope=scope, chunk_size=chunk_size):
+            self.write(chunk, scope=scope)
+
+    async def awrite_batch(
+        self,
+        records: List[Dict[str, Any]],
+        *,
+        scope: str = "long_term",
+        chunk_size: int = 128,
+    ) -> None:
+        """write_batch 的异步版本：攒满的块通过 awrite 写出；结束时需 await aflush()。"""
+        for chunk in self._enqueue(records, scope=scope, chunk_size=chunk_size):
+            await self.awrite(chunk, scope=scope)
+
+    def _enqueue(self, records: List[Dict[str, Any]], *, scope: str, chunk_size: int) -> List[List[Dict[str, Any]]]:
+        """records 入队，取出所有已攒满 chunk_size 的块（剩余部分留在队列中）。"""
+        if chunk_size < 1:
+            raise ValueError(f"chunk_size 必须 >= 1，收到 {chunk_size!r}")
+        if scope != "long_term" or not records:
+            return []
+        self._pending.extend(records)
+        chunks = []
+        while len(self._pending) >= chunk_size:
+            chunks.append(self._pending[:chunk_size])
+            del self._pending[:chunk_size]
+        return chunks
+
+    def flush(self) -> None:
+        """写出 write_batch() 队列中剩余的事实。"""
+        if self._pending:
+            chunk, self._pending = self._pending, []
+            self.write(chunk, scope="long_term")
+
+    async def aflush(self) -> None:
+        """flush 的异步版本。"""
+        if self._pending:
+            chunk, self._pending = self._pending, []
+            await self.awrite(chunk, scope="long_term")
 
     # ---------------- 搜索/分页（List Passages with search） ----------------
-    def search(self, query: str, *, k: int = 10, page: int = 1, page_size: int = 50) -> List[Dict[str, Any]]:
+    def search(
+        self,
+        query: str,
+        *,
+        k: int = 10,
+        page: int = 1,
+        page_size: int = 50,
+        after: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
         """
-        通过多次 list(... after=...) 推进游标，抵达目标页，再返回该页前 k 条。
+        游标（keyset）分页，返回目标页的前 k 条。
+        - 传入 after（上一页最后一条 id）：直接从该游标取，1 次请求
+        - 否则按 page 定位：查缓存中第 page-1 页的游标；缺失时从最近的已缓存页向后推进并沿途缓存
+        目标页只取 limit=min(k, page_size) 条，避免多拉数据。
         ascending=True 表示旧->新；若需“最新优先”可改为 False。
         """
-        after: Optional[str] = None
-        current = 1
-        last_page_items = []
-
-        while current <= page:
-            items = self.client.agents.passages.list(
-                agent_id=self.agent_id,
-                search=query if query else None,
-                limit=page_size,
-                after=after,
-                ascending=True,
-            )
-            last_page_items = items
-            after = items[-1].id if items else None
-            if not items or after is None:
-                break
-            current += 1
-
-        # 统一转成可 JSON 序列化的 dict（datetime -> ISO 字符串）
-        results: List[Dict[str, Any]] = []
-        for p in last_page_items[:k]:
-            created_at = getattr(p, "created_at", None)
-            updated_at = getattr(p, "updated_at", None)
-            if hasattr(created_at, "isoformat"):
-                created_at = created_at.isoformat()
-            if hasattr(updated_at, "isoformat"):
-                updated_at = updated_at.isoformat()
-
-            results.append(
-                {
-                    "id": getattr(p, "id", None),
-                    "text": getattr(p, "text", None),
-                    "created_at": created_at,
-                    "updated_at": updated_at,
-                }
-            )
-        return results
+        # 快速路径：第 1 页或已给出游标时不进入 _seek，只发 1 次请求
+        if after is None and page > 1:
+            after = self._seek(query, page, page_size)
+            if after is None:
+                return []  # 目标页之前已无数据
+
+        items = self._list(query, limit=min(k, page_size), after=after)
+        return [_passage_to_dict(p) for p in items[:k]]
+
+    def _list(self, query: str, *, limit: int, after: Optional[str]) -> List[Any]:
+        return self.client.agents.passages.list(
+            agent_id=self.agent_id,
+            search=query if query else None,
+            limit=limit,
+            after=after,
+            ascending=True,
+        )
+
+    def _seek(self, query: str, page: int, page_size: int) -> Optional[str]:
+        """返回第 page-1 页最后一条的 id（即第 page 页的 after 游标）；前面已无数据时返回 None。"""
+        start, after = 1, None
+        with self._cursor_lock:
+            for p in range(page - 1, 0, -1):
+                key = (query, page_size, p)
+                if key in self._cursor_cache:
+                    self._cursor_cache.move_to_end(key)
+                    start, after = p + 1, self._cursor_cache[key]
+                    break
+
+        for p in range(start, page):
+            items = self._list(query, limit=page_size, after=after)
+            if not items:
+                return None
+            after = getattr(items[-1], "id", None)
+            if after is None:
+                return None
+            with self._cursor_lock:
+                self._cursor_cache[(query, page_size, p)] = after
+                if len(self._cursor_cache) > _CURSOR_CACHE_SIZE:
+                    self._cursor_cache.popitem(last=False)
+            if len(items) < page_size:
+                return None  # 本页未满，后续页为空
+        return after
 
     # ---------------- 修改/删除（评测非必需） ----------------
     def update(self, patch: Dict[str, Any]) -> None:
@@ -187,6 +346,17 @@ class LettaAdapter(MemoryAdapter):
             self.client.agents.passages.delete(agent_id=self.agent_id, memory_id=memory_id)
         except Exception as e:
             raise RuntimeError(f"Letta delete failed: {e}")
+        with self._cursor_lock:
+            self._cursor_cache.clear()
+
+    # ---------------- 异步版本 ----------------
+    async def asearch(self, query: str, **kwargs: Any) -> List[Dict[str, Any]]:
+        """search 的异步版本，参数同 search。"""
+        return await asyncio.to_thread(self.search, query, **kwargs)
+
+    async def adelete(self, memory_id: str) -> None:
+        """delete 的异步版本。"""
+        await asyncio.to_thread(self.delete, memory_id)
 
     # ---------------- 辅助 ----------------
     def summarize(self, items: List[Dict[str, Any]]) -> str:
@@ -3,22 +3,23 @@ from __future__ import annotations
 import os
 from typing import List, Dict, Any, Optional
 
+from .http_pool import pooled_http_client
+
 
 def _fact_to_text(f: Dict[str, Any]) -> str:
-    subj = f.get("subject", "")
-    pred = f.get("predicate", "")
-    obj  = f.get("object", "")
+    base = f"{f.get('subject', '')} {f.get('predicate', '')} {f.get('object', '')}."
     ts   = f.get("ts")
-    tags = f.get("tags", [])
+    tags = f.get("tags")
     src  = f.get("source")
-    parts = [f"{subj} {pred} {obj}."]
-    meta = []
-    if src:  meta.append(f"source:{src}")
-    if tags: meta.append("tags:" + ",".join(tags))
-    if ts:   meta.append(f"ts:{ts}")
-    if meta:
-        parts.append(f" ({', '.join(meta)})")
-    return "".join(parts)
+    # 快速路径：无元信息时直接返回，不构造 meta 列表
+    if not (src or tags or ts):
+        return base
+    meta = [m for m in (
+        src and f"source:{src}",
+        tags and "tags:" + ",".join(tags),
+        ts and f"ts:{ts}",
+    ) if m]
+    return f"{base} ({', '.join(meta)})"
 
 
 class Mem0Adapter:
@@ -37,9 +38,12 @@ class Mem0Adapter:
         api_key = os.getenv("MEM0_API_KEY")
         assert api_key, "请设置 MEM0_API_KEY"
 
-        self.client = MemoryClient(api_key=api_key)
+        # 共享 keep-alive 连接池（MemoryClient 接受外部 httpx.Client）
+        self.client = MemoryClient(api_key=api_key, client=pooled_http_client(300))
         self.namespace = namespace or os.getenv("MEM0_NAMESPACE", "default")
         self.version = "v2"
+        # namespace 在实例内不变：检索过滤条件只构造一次
+        self._search_filters = {"AND": [{"user_id": self.namespace}]}
 
     def write(self, facts: List[Dict[str, Any]], scope: str = "long_term") -> List[str]:
         ids: List[str] = []
@@ -62,8 +66,7 @@ class Mem0Adapter:
         return ids
 
     def search(self, query: str, k: int = 5, page: int = 1, page_size: int = 50) -> List[Dict[str, Any]]:
-        filters = {"AND": [{"user_id": self.namespace}]}
-        resp = self.client.search(query, version=self.version, filters=filters)
+        resp = self.client.search(query, version=self.version, filters=self._search_filters)
         out: List[Dict[str, Any]] = []
         items = []
 
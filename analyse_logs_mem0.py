@@ -3,38 +3,58 @@ import json
 import argparse
 import statistics
 from collections import defaultdict
+from functools import partial
+from operator import is_not
 
-def safe_get(d, *keys, default=None):
-    for k in keys:
-        if k in d:
-            return d[k]
-    return default
+from _jsonl import iter_lines, loads
+
+def _parse_line(line):
+    """解析一行（首尾空白由解析器跳过）；orjson 拒绝的行（如含 NaN）退回标准库；仍失败则返回 None"""
+    try:
+        return loads(line)
+    except ValueError:
+        try:
+            return json.loads(line)
+        except ValueError:
+            return None
 
 def load_jsonl(path):
     rows = []
-    with open(path, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                rows.append(json.loads(line))
-            except Exception:
-                pass
+    with open(path, "rb") as f:
+        # map/filter 在 C 层迭代，省去 Python 层的 for + append
+        # 空行与纯空白行解析失败返回 None，一并被过滤，无需逐行 strip；
+        # 只滤掉 None（解析失败），{} 等合法但为假的记录照常保留
+        rows.extend(filter(partial(is_not, None), map(_parse_line, filter(None, iter_lines(f)))))
     return rows
 
+def _median_sorted(xs):
+    n = len(xs)
+    mid = n // 2
+    return xs[mid] if n % 2 else (xs[mid - 1] + xs[mid]) / 2
+
+def _p95_sorted(xs):
+    """与 statistics.quantiles(xs, n=20)[18] 一致（exclusive 插值），但要求 xs 已排序。"""
+    ld = len(xs)
+    m = ld + 1
+    j = 19 * m // 20
+    j = 1 if j < 1 else ld - 1 if j > ld - 1 else j
+    delta = 19 * m - j * 20
+    return (xs[j - 1] * (20 - delta) + xs[j] * delta) / 20
+
 def summarize_phase(rows, phase_name):
-    xs = [r for r in rows if safe_get(r, "phase") == phase_name]
+    xs = [r for r in rows if r.get("phase") == phase_name]
     n = len(xs)
     if not n:
         return {"count": 0, "hit_rate": 0.0, "avg_latency": None, "p50_latency": None, "p95_latency": None}
-    hits = [bool(safe_get(r, "used_memory", default=False)) for r in xs]
-    lat = [int(safe_get(r, "latency_ms", default=0)) for r in xs]
-
-    hit_rate = sum(1 for h in hits if h) / n
-    avg_latency = sum(lat)/n if n else None
-    p50 = statistics.median(lat) if lat else None
-    p95 = statistics.quantiles(lat, n=20)[18] if len(lat) >= 20 else max(lat) if lat else None
+    hits = [bool(r.get("used_memory", False)) for r in xs]
+    lat = [int(r.get("latency_ms", 0)) for r in xs]
+
+    # 只排序一次，p50 / p95 直接按下标取值
+    lat.sort()
+    hit_rate = sum(hits) / n
+    avg_latency = sum(lat) / n
+    p50 = _median_sorted(lat)
+    p95 = _p95_sorted(lat) if n >= 20 else lat[-1]
     return {
         "count": n,
         "hit_rate": hit_rate,
@@ -47,8 +67,8 @@ def build_query_pairs(rows):
     """将同一 query 的 pass1 / pass2 配成对"""
     per_query = defaultdict(dict)
     for r in rows:
-        q = safe_get(r, "query", default="")
-        ph = safe_get(r, "phase", default="")
+        q = r.get("query", "")
+        ph = r.get("phase", "")
         per_query[q][ph] = r
     pairs = []
     for q, d in per_query.items():
@@ -76,8 +96,8 @@ def main():
 
     # 基本信息
     total = len(rows)
-    namespace = safe_get(rows[0], "namespace", default="(unknown)")
-    framework = safe_get(rows[0], "framework", default="(unknown)")
+    namespace = rows[0].get("namespace", "(unknown)")
+    framework = rows[0].get("framework", "(unknown)")
 
     print_section("Mem0 日志分析（strict hit/miss）")
     print(f"框架: {framework}")
@@ -103,10 +123,10 @@ def main():
     mm = mh = hm = hh = 0
     deltas = []  # pass2 - pass1
     for q, p1, p2 in pairs:
-        h1 = bool(safe_get(p1, "used_memory", default=False))
-        h2 = bool(safe_get(p2, "used_memory", default=False))
-        l1 = int(safe_get(p1, "latency_ms", default=0))
-        l2 = int(safe_get(p2, "latency_ms", default=0))
+        h1 = bool(p1.get("used_memory", False))
+        h2 = bool(p2.get("used_memory", False))
+        l1 = int(p1.get("latency_ms", 0))
+        l2 = int(p2.get("latency_ms", 0))
         deltas.append(l2 - l1)
         if not h1 and h2:
             mh += 1
@@ -131,18 +151,18 @@ def main():
         print(f"p50 差值: {p50_delta:.2f} ms")
 
     # TopK 最慢/最快（按 pass2）
-    pass2_rows = [r for r in rows if safe_get(r, "phase") == "pass2"]
-    pass2_rows.sort(key=lambda r: int(safe_get(r, "latency_ms", default=0)), reverse=True)
+    pass2_rows = [r for r in rows if r.get("phase") == "pass2"]
+    pass2_rows.sort(key=lambda r: int(r.get("latency_ms", 0)), reverse=True)
     worst = pass2_rows[:ns.topk]
     best = list(reversed(pass2_rows[-ns.topk:]))
 
     print_section(f"Top{ns.topk} 最慢（按 pass2）")
     for r in worst:
-        print(f"{safe_get(r, 'latency_ms', default='?')} ms  | hit={bool(safe_get(r, 'used_memory', default=False))} | {safe_get(r, 'query', default='')}")
+        print(f"{r.get('latency_ms', '?')} ms  | hit={bool(r.get('used_memory', False))} | {r.get('query', '')}")
 
     print_section(f"Top{ns.topk} 最快（按 pass2）")
     for r in best:
-        print(f"{safe_get(r, 'latency_ms', default='?')} ms  | hit={bool(safe_get(r, 'used_memory', default=False))} | {safe_get(r, 'query', default='')}")
+        print(f"{r.get('latency_ms', '?')} ms  | hit={bool(r.get('used_memory', False))} | {r.get('query', '')}")
 
 if __name__ == "__main__":
     main()
@@ -8,78 +8,89 @@ import argparse
 import json
 import sys
 from collections import defaultdict
+from pathlib import Path
 
-def safe_avg(nums):
-    return sum(nums) / len(nums) if nums else 0.0
+from _jsonl import iter_lines, loads
+
+def safe_div(num, den):
+    return num / den if den else 0.0
 
 def fmt_pct(n, d):
     return f"{(n/d*100):.2f}%" if d else "NA"
 
 def analyze(records):
     """
-    records: list of dict, 每个包含至少：
+    records: 可迭代的 dict（list 或 iter_jsonl 生成器），每个包含至少：
       - mode: 'fat' or 'paged'
       - used_memory: bool
       - latency_ms: int/float
+
+    单次遍历：每条记录同时累加到所属模式与总体的计数器，
+    不再为每个模式、命中/未命中分别构造子列表。
     """
-    # 按模式聚合
-    buckets = defaultdict(list)  # key: mode
+    # 累加器：[总次数, 命中次数, 命中延迟和, 未命中延迟和]
+    buckets = defaultdict(lambda: [0, 0, 0.0, 0.0])  # key: mode
+    overall_acc = [0, 0, 0.0, 0.0]
     for r in records:
-        buckets[r.get("mode", "unknown")].append(r)
-
-    def calc_stats(rs):
-        total = len(rs)
-        hits = [r for r in rs if r.get("used_memory") is True]
-        misses = [r for r in rs if r.get("used_memory") is not True]
-
-        hit_rate = fmt_pct(len(hits), total)
-        avg_lat_hit = safe_avg([float(r.get("latency_ms", 0)) for r in hits])
-        avg_lat_miss = safe_avg([float(r.get("latency_ms", 0)) for r in misses])
-
+        lat = float(r.get("latency_ms", 0))
+        hit = r.get("used_memory") is True
+        for acc in (buckets[r.get("mode", "unknown")], overall_acc):
+            acc[0] += 1
+            if hit:
+                acc[1] += 1
+                acc[2] += lat
+            else:
+                acc[3] += lat
+
+    def calc_stats(acc):
+        total, hits, lat_hit, lat_miss = acc
         return {
             "total": total,
-            "hits": len(hits),
-            "hit_rate": hit_rate,
-            "avg_latency_hit_ms": avg_lat_hit,
-            "avg_latency_miss_ms": avg_lat_miss,
+            "hits": hits,
+            "hit_rate": fmt_pct(hits, total),
+            "avg_latency_hit_ms": safe_div(lat_hit, hits),
+            "avg_latency_miss_ms": safe_div(lat_miss, total - hits),
         }
 
     # 分模式
-    per_mode = {mode: calc_stats(rs) for mode, rs in buckets.items()}
+    per_mode = {mode: calc_stats(acc) for mode, acc in buckets.items()}
     # 总体
-    overall = calc_stats(records)
+    overall = calc_stats(overall_acc)
 
     return per_mode, overall
 
-def load_jsonl(paths):
-    recs = []
+def iter_jsonl(paths):
+    """逐行流式产出记录，不在内存中保留整份日志。"""
     for p in paths:
-        try:
-            with open(p, "r", encoding="utf-8") as f:
-                for line in f:
-                    line = line.strip()
-                    if not line:
+        if not Path(p).is_file():
+            print(f"[WARN] 文件不存在：{p}", file=sys.stderr)
+            continue
+        with open(p, "rb") as f:
+            for line in iter_lines(f):
+                if not line:
+                    continue
+                # 不逐行 strip：JSON 解析器本身会跳过首尾空白（含 \r）
+                try:
+                    yield loads(line)
+                except json.JSONDecodeError:  # orjson.JSONDecodeError 亦是其子类
+                    if line.isspace():
                         continue
+                    # orjson 更严格（如拒绝 NaN），退回标准库再试一次
                     try:
-                        recs.append(json.loads(line))
+                        yield json.loads(line)
                     except json.JSONDecodeError as e:
                         print(f"[WARN] 跳过无法解析的行（{p}）: {e}", file=sys.stderr)
-        except FileNotFoundError:
-            print(f"[WARN] 文件不存在：{p}", file=sys.stderr)
-    return recs
 
 def main():
     ap = argparse.ArgumentParser(description="统计命中率与平均延迟（命中/未命中）")
     ap.add_argument("logs", nargs="+", help="一个或多个 JSONL 日志文件")
     args = ap.parse_args()
 
-    records = load_jsonl(args.logs)
-    if not records:
+    per_mode, overall = analyze(iter_jsonl(args.logs))
+    if not overall["total"]:
         print("未读取到任何记录。请确认日志路径是否正确。")
         return
 
-    per_mode, overall = analyze(records)
-
     print("\n=== 按模式统计 ===")
     for mode, s in per_mode.items():
         print(f"- mode: {mode}")
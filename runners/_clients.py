@@ -0,0 +1,57 @@
+# runners/_clients.py
+# runners 共享的辅助函数：
+#   - get_letta / get_mem0：进程内共享的 SDK 客户端，首次调用时构造，之后复用同一个
+#     keep-alive 连接池，多次运行 smoke / 评测时不再重复 DNS 解析与 TLS 握手
+#   - load_env：加载 .env
+#   - dumps_pretty：缩进格式的 JSON 输出
+#   - dumps_line：JSONL 日志的一行（bytes）
+import json
+import os
+from functools import lru_cache
+
+from adapters.http_pool import pooled_http_client
+
+# 输出序列化：优先 orjson（C 实现，indent 输出也很快；日志行直接产出 UTF-8 bytes），未安装时退回标准库
+try:
+    import orjson
+
+    def dumps_pretty(o) -> str:
+        return orjson.dumps(o, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS, default=str).decode()
+
+    def dumps_line(rec) -> bytes:
+        return orjson.dumps(rec) + b"\n"
+except ImportError:
+    def dumps_pretty(o) -> str:
+        return json.dumps(o, ensure_ascii=False, indent=2, default=str)
+
+    def dumps_line(rec) -> bytes:
+        return (json.dumps(rec, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def load_env() -> None:
+    """加载 .env（可选依赖 python-dotenv）；不覆盖已存在的环境变量，可在 main() 开头无条件调用。"""
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except Exception:
+        pass
+
+
+@lru_cache(maxsize=None)
+def get_letta():
+    from letta_client import Letta
+
+    return Letta(
+        token=os.getenv("LETTA_TOKEN"),
+        project=os.getenv("LETTA_PROJECT"),
+        httpx_client=pooled_http_client(),
+    )
+
+
+@lru_cache(maxsize=None)
+def get_mem0():
+    from mem0 import MemoryClient
+
+    api_key = os.getenv("MEM0_API_KEY")
+    assert api_key, "请设置 MEM0_API_KEY"
+    return MemoryClient(api_key=api_key, client=pooled_http_client(300))
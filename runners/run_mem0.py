@@ -1,8 +1,11 @@
 # runners/run_mem0_strict_hit_miss.py
-import os, sys, time, json, argparse
+import os, sys, time, argparse, random
+from concurrent.futures import ThreadPoolExecutor
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
 from mem0 import MemoryClient
+from adapters.http_pool import pooled_http_client
+from runners._clients import dumps_line
 try:
     from dotenv import load_dotenv
     load_dotenv()
@@ -32,36 +35,45 @@ def parse_items_from_search(resp):
                 return resp[k]
     return []
 
-def is_true_hit(q: str, text: str) -> bool:
+def hit_tokens(q: str):
+    """query -> (subj, obj) 小写 token；只依赖 query，可预先计算。"""
     parts = (q or "").split()
     if len(parts) < 3:
+        return None
+    return parts[0].lower(), parts[-1].lower()
+
+def is_true_hit(tokens, text_lower: str) -> bool:
+    """text_lower 由调用方对每条命中文本小写一次后传入。"""
+    if tokens is None:
         return False
-    subj, obj = parts[0].lower(), parts[-1].lower()
-    t = (text or "").lower()
-    return (subj in t) and (obj in t)
+    subj, obj = tokens
+    return (subj in text_lower) and (obj in text_lower)
+
+# 50 条 query（与你的评测一致）及其命中 token：静态，导入时构造一次
+QUESTIONS = tuple(f"gold.entity.{i} is associated with gold.topic.{i%10}" for i in range(1, 51))
+QUERY_TOKENS = {q: hit_tokens(q) for q in QUESTIONS}
 
 def fact_to_text(f) -> str:
-    subj = f.get("subject", "")
-    pred = f.get("predicate", "")
-    obj  = f.get("object", "")
-    return f"{subj} {pred} {obj}."
+    # 评测只需 canonical 三元组，不附带 meta
+    return f"{f.get('subject', '')} {f.get('predicate', '')} {f.get('object', '')}."
 
-def safe_add(client: MemoryClient, text: str, user_id: str, max_retries=5, base_delay=0.4):
+def safe_add(client: MemoryClient, messages: list, user_id: str, max_retries=5, base_delay=0.4):
     """
-    写入带指数退避，避免 429/5xx 导致“卡住”。
+    写入带指数退避（full jitter），避免 429/5xx 导致“卡住”。
+    messages 可包含多条消息：同一页的事实合并为一次 add 请求。
     """
     delay = base_delay
     for i in range(max_retries + 1):
         try:
-            client.add(messages=[{"role": "user", "content": text}],
-                       user_id=user_id, version=VERSION)
+            client.add(messages=messages, user_id=user_id, version=VERSION)
             return True
         except Exception as e:
             msg = str(e)
             # 命中限流/后端抖动 → 退避重试
             if any(code in msg for code in ("429", "502", "503", "504")) and i < max_retries:
-                time.sleep(delay)
-                delay = min(delay * 2, 6.0)
+                # full jitter：并发 worker 的重试时间随机错开，避免同步重试压垮服务端
+                time.sleep(random.uniform(0, min(delay, 6.0)))
+                delay *= 2
             else:
                 # 其他错误/已到达最大重试 → 不中断整体流程
                 print(f"[WARN] add failed (attempt {i+1}/{max_retries+1}): {e}")
@@ -75,7 +87,9 @@ def run(out="outputs/logs_mem0_strict_hit_miss.jsonl",
         cap_per_page=2,        # 每页写入上限（小一点更稳）；None/-1 表示不限制（可能很慢）
         n_facts=10000,
         n_gold=500,
-        seed=42):
+        seed=42,
+        max_concurrency=1,     # 并发 query 数；默认 1 = 逐条顺序执行（与 run_letta / 历史日志可比）
+        quiet=False):          # True 时不在终端逐条打印记录
     """
     两阶段 strict hit/miss：
       - pass1：检索，未命中→按模式写入；记录 latency、items_written
@@ -87,7 +101,11 @@ def run(out="outputs/logs_mem0_strict_hit_miss.jsonl",
     # 1) 初始化 client/namespace
     api_key = os.getenv("MEM0_API_KEY")
     assert api_key, "请设置 MEM0_API_KEY"
-    client = MemoryClient(api_key=api_key)
+    # keep-alive 连接池按并发度放大，避免线程间争抢连接
+    client = MemoryClient(
+        api_key=api_key,
+        client=pooled_http_client(300, max_keepalive_connections=max(32, max_concurrency)),
+    )
     ns = namespace or os.getenv("MEM0_NAMESPACE", "mem-eval-fixed")
     print(f"[INFO] namespace={ns}  mode={mode}")
 
@@ -102,71 +120,93 @@ def run(out="outputs/logs_mem0_strict_hit_miss.jsonl",
             seed=seed,
         )
 
-    # 3) 50 条 query（与你的评测一致）
-    questions = [f"gold.entity.{i} is associated with gold.topic.{i%10}" for i in range(1, 51)]
+    # 两轮检索共用同一份参数（只读，可在线程间共享）
+    search_kwargs = {"version": VERSION, "filters": {"AND": [{"user_id": ns}]}}
+
+    # MemoryClient 为同步 SDK：max_concurrency > 1 时用线程池并发 query，网络等待期间会释放 GIL。
+    # 注意：并发下 latency_ms 含客户端/服务端争用，且其他 query 的 pass1 写入可能提前被命中，
+    # 结果与顺序执行（默认）不可直接比较。
+    workers = max(1, max_concurrency)
+
+    def _pass1(q):
+        t0 = time.monotonic()
+        resp = client.search(q, **search_kwargs)
+        hits = parse_items_from_search(resp)
+        tokens = QUERY_TOKENS[q]
+        hit = any(is_true_hit(tokens, (h.get("text") or "").lower()) for h in hits)
+
+        wrote = 0
+        if not hit:
+            if mode == "fat":
+                text = canonical_fact_text(q)
+                safe_add(client, [{"role": "user", "content": text}], ns)
+                wrote = 1
+            else:
+                # paged：分页写少量，带退避重试，避免卡住
+                total_written = 0
+                cursor = None
+                for _ in range(pages):
+                    # 游标续取：每页只取 page_size 条，无需按 page 重新定位
+                    resp_tool = backend.query(q, mode="paged", after=cursor, page_size=page_size)
+                    page_items = resp_tool.get("items", [])
+                    # 控制每页写入上限（默认 2；太大会慢/被限流）
+                    if cap_per_page is not None and cap_per_page >= 0:
+                        page_items = page_items[:cap_per_page]
+                    # 整页合并为一次 add（多条 message），摊薄每次请求的握手/解析开销
+                    batched_msgs = [{"role": "user", "content": fact_to_text(f)} for f in page_items]
+                    if batched_msgs and safe_add(client, batched_msgs, ns):
+                        total_written += len(batched_msgs)
+                    # 轻微节流，避免连续打爆
+                    time.sleep(0.05)
+                    cursor = resp_tool.get("next_cursor")
+                    if cursor is None:
+                        break
+                wrote = total_written
+
+        latency_ms = int((time.monotonic() - t0) * 1000)
+        return {
+            "framework": "Mem0",
+            "phase": "pass1",
+            "query": q,
+            "used_memory": hit,
+            "items_written": wrote,
+            "latency_ms": latency_ms,
+            "namespace": ns
+        }
+
+    def _pass2(q):
+        t0 = time.monotonic()
+        resp = client.search(q, **search_kwargs)
+        hits = parse_items_from_search(resp)
+        tokens = QUERY_TOKENS[q]
+        hit = any(is_true_hit(tokens, (h.get("text") or "").lower()) for h in hits)
+        latency_ms = int((time.monotonic() - t0) * 1000)
+        return {
+            "framework": "Mem0",
+            "phase": "pass2",
+            "query": q,
+            "used_memory": hit,
+            "latency_ms": latency_ms,
+            "namespace": ns
+        }
 
     os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
-    with open(out, "w", encoding="utf-8") as log:
+    # 日志只在主线程按 query 顺序写入（ex.map 保序），无需加锁
+    # 64 KiB 写缓冲：多条记录合并为一次系统调用
+    with open(out, "wb", buffering=1 << 16) as log, \
+            ThreadPoolExecutor(max_workers=workers) as query_pool:
 
         # ---------- Pass 1 ----------
-        for q in questions:
-            t0 = time.time()
-            resp = client.search(q, version=VERSION, filters={"AND":[{"user_id": ns}]})
-            hits = parse_items_from_search(resp)
-            hit = any(is_true_hit(q, h.get("text","")) for h in hits)
-
-            wrote = 0
-            if not hit:
-                if mode == "fat":
-                    text = canonical_fact_text(q)
-                    safe_add(client, text, ns)
-                    wrote = 1
-                else:
-                    # paged：分页写少量，带退避重试，避免卡住
-                    total_written = 0
-                    for p in range(1, pages + 1):
-                        resp_tool = backend.query(q, mode="paged", page=p, page_size=page_size)
-                        page_items = resp_tool.get("items", [])
-                        # 控制每页写入上限（默认 2；太大会慢/被限流）
-                        if cap_per_page is not None and cap_per_page >= 0:
-                            page_items = page_items[:cap_per_page]
-                        for f in page_items:
-                            if safe_add(client, fact_to_text(f), ns):
-                                total_written += 1
-                        # 轻微节流，避免连续打爆
-                        time.sleep(0.05)
-                    wrote = total_written
-
-            latency_ms = int((time.time() - t0) * 1000)
-            rec = {
-                "framework": "Mem0",
-                "phase": "pass1",
-                "query": q,
-                "used_memory": hit,
-                "items_written": wrote,
-                "latency_ms": latency_ms,
-                "namespace": ns
-            }
-            log.write(json.dumps(rec, ensure_ascii=False) + "\n")
-            print(rec)
-
-        # ---------- Pass 2 ----------
-        for q in questions:
-            t0 = time.time()
-            resp = client.search(q, version=VERSION, filters={"AND":[{"user_id": ns}]})
-            hits = parse_items_from_search(resp)
-            hit = any(is_true_hit(q, h.get("text","")) for h in hits)
-            latency_ms = int((time.time() - t0) * 1000)
-            rec = {
-                "framework": "Mem0",
-                "phase": "pass2",
-                "query": q,
-                "used_memory": hit,
-                "latency_ms": latency_ms,
-                "namespace": ns
-            }
-            log.write(json.dumps(rec, ensure_ascii=False) + "\n")
-            print(rec)
+        for rec in query_pool.map(_pass1, QUESTIONS):
+            log.write(dumps_line(rec))
+            if not quiet:
+                print(rec)
+
+        # ---------- Pass 2 ----------（pass1 全部完成后才开始）
+        for rec in query_pool.map(_pass2, QUESTIONS):
+            log.write(dumps_line(rec))
+            if not quiet:
+                print(rec)
 
 if __name__ == "__main__":
     ap = argparse.ArgumentParser()
@@ -182,6 +222,10 @@ if __name__ == "__main__":
     ap.add_argument("--n_facts", type=int, default=10000)
     ap.add_argument("--n_gold", type=int, default=500)
     ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--max_concurrency", type=int, default=1,
+                    help="并发 query 数（默认 1=顺序执行）；>1 时 latency 含并发争用、命中结果依赖调度，"
+                         "与 run_letta / 历史日志不可比")
+    ap.add_argument("--quiet", action="store_true", help="不在终端逐条打印记录")
     ns = ap.parse_args()
 
     run(out=ns.out,
@@ -192,4 +236,6 @@ if __name__ == "__main__":
         cap_per_page=ns.cap_per_page,
         n_facts=ns.n_facts,
         n_gold=ns.n_gold,
-        seed=ns.seed)
+        seed=ns.seed,
+        max_concurrency=ns.max_concurrency,
+        quiet=ns.quiet)
@@ -1,41 +1,40 @@
 import os
-import json
 import sys
+import asyncio
+import argparse
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
-from adapters.letta_adapter import LettaAdapter
-from letta_client import Letta
+from runners._clients import dumps_pretty, get_letta, load_env   # SDK 在工厂函数内才导入
 
-# 可选：自动加载 .env
-try:
-    from dotenv import load_dotenv
-    load_dotenv()
-except Exception:
-    pass
 
+async def main(n_facts: int = 1):
+    # adapter 模块顶层导入 letta_client（→ httpx/pydantic），只在真正运行时导入
+    from adapters.letta_adapter import LettaAdapter
 
-def main():
+    load_env()   # 每次运行都加载 .env（不覆盖已有变量），LETTA_TOKEN / LETTA_PROJECT 也从中读取
     agent_id = os.getenv("LETTA_AGENT_ID")
     assert agent_id, "请设置 LETTA_AGENT_ID"
 
-    sdk_client = Letta(
-        token=os.getenv("LETTA_TOKEN"),
-        project=os.getenv("LETTA_PROJECT"),
-    )
-    adapter = LettaAdapter(sdk_client=sdk_client, agent_id=os.getenv("LETTA_AGENT_ID"))
+    adapter = LettaAdapter(sdk_client=get_letta(), agent_id=agent_id)
 
-    # 1) create
+    # 1) create：write→search→delete 保持先后顺序，但每块内的 create 并发发出
     fact = {"subject": "Project Orion", "predicate": "was released in", "object": "2024", "ts": "2024-06-01T00:00:00", "tags": ["orion","release"], "source":"demo"}
-    adapter.write([fact], scope="long_term")
-    print("Created one passage.")
+    facts = [fact] + [dict(fact, source=f"demo-{i}") for i in range(1, n_facts)]
+    # 缓冲写入：攒满的块立即写出，剩余部分由 aflush() 收尾
+    await adapter.awrite_batch(facts, scope="long_term")
+    await adapter.aflush()
+    print(f"Created {len(facts)} passage(s).")
 
     # 2) search
-    hits = adapter.search("Project Orion", k=3, page=1, page_size=10)
-    print("Search hits:", json.dumps(hits, ensure_ascii=False, indent=2, default=str))
+    hits = await adapter.asearch("Project Orion", k=3, page=1, page_size=10)
+    print("Search hits:", dumps_pretty(hits))
 
     # 3) 可选：delete（清理）
     if hits:
-        adapter.delete(hits[0]["id"])
+        await adapter.adelete(hits[0]["id"])
         print("Deleted passage:", hits[0]["id"])
 
 if __name__ == "__main__":
-    main()
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n_facts", type=int, default=1, help="批量写入的事实条数")
+    ns = ap.parse_args()
+    asyncio.run(main(n_facts=ns.n_facts))
@@ -1,63 +1,72 @@
 # runners/smoke_mem0_sdk.py
 import os
-import json
-from mem0 import MemoryClient
+import sys
+import asyncio
+import argparse
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from runners._clients import dumps_pretty, get_mem0, load_env   # mem0 SDK 在工厂函数内才导入
 
-# 可选：自动加载 .env
-try:
-    from dotenv import load_dotenv
-    load_dotenv()
-except Exception:
-    pass
 
+_ID_KEYS = ("id", "memory_id", "uuid")
 
-def main():
+
+def _memory_id(resp):
+    """从 add 返回中解析一个 memory_id（兼容不同字段名）。"""
+    if not isinstance(resp, dict):
+        return None
+    mems = resp.get("memories")
+    src = mems[0] if isinstance(mems, list) and mems else resp
+    return next((src[k] for k in _ID_KEYS if src.get(k)), None)
+
+
+def _search_items(resp):
+    """规整 search 返回：list 原样返回，dict 取 results/items/memories 中第一个 list。"""
+    if isinstance(resp, list):
+        return resp
+    if isinstance(resp, dict):
+        return next((resp[k] for k in ("results", "items", "memories") if isinstance(resp.get(k), list)), [])
+    return []
+
+
+async def run_queries(client, queries, namespace, *, version="v2"):
+    """并发检索多条 query（限定 user_id=namespace），按输入顺序返回各自的命中列表。"""
+    filters = {"AND": [{"user_id": namespace}]}
+    resps = await asyncio.gather(*(
+        asyncio.to_thread(client.search, q, version=version, filters=filters) for q in queries
+    ))
+    return [_search_items(r) for r in resps]
+
+
+async def main(queries=("Orion released",)):
+    load_env()   # 每次运行都加载 .env（不覆盖已有变量），MEM0_NAMESPACE 等也从中读取
     api_key = os.getenv("MEM0_API_KEY")
     assert api_key, "请先设置 MEM0_API_KEY"
     namespace = os.getenv("MEM0_NAMESPACE", "default")
     version = "v2"
 
-    client = MemoryClient(api_key=api_key)
+    client = get_mem0()   # 进程内共享，复用 keep-alive 连接池
+    # MemoryClient 为同步 SDK：各调用放到线程中执行，不阻塞事件循环，便于与其他 smoke 并发
 
     # 1) 写入一条事实（作为一轮 user 消息）
     text = "Project Orion was released in 2024. (source:demo, tags:orion,release, ts:2024-06-01T00:00:00)"
-    resp_add = client.add(
+    resp_add = await asyncio.to_thread(
+        client.add,
         messages=[{"role": "user", "content": text}],
         user_id=namespace,
         version=version,
     )
-    print("ADD resp:", json.dumps(resp_add, ensure_ascii=False, indent=2))
-
-    # 从返回中尽量解析一个 memory_id（兼容不同字段名）
-    memory_id = None
-    if isinstance(resp_add, dict):
-        if "memories" in resp_add and isinstance(resp_add["memories"], list) and resp_add["memories"]:
-            memory_id = resp_add["memories"][0].get("id") or resp_add["memories"][0].get("memory_id")
-        else:
-            memory_id = resp_add.get("id") or resp_add.get("memory_id") or resp_add.get("uuid")
-
-    # 2) 搜索（限定 user_id=namespace）
-    query = "Orion released"
-    filters = {"AND": [{"user_id": namespace}]}
-    resp_search = client.search(query, version=version, filters=filters)
-
-    # 规整输出
-    items = []
-    if isinstance(resp_search, list):
-        items = resp_search
-    elif isinstance(resp_search, dict):
-        for key in ("results", "items", "memories"):
-            if key in resp_search and isinstance(resp_search[key], list):
-                items = resp_search[key]
-                break
+    print("ADD resp:", dumps_pretty(resp_add))
+    memory_id = _memory_id(resp_add)
 
-    print("SEARCH hits:", json.dumps(items[:5], ensure_ascii=False, indent=2))
+    # 2) 搜索：多条 query 同时在途，总耗时约为最慢的一次往返
+    for query, items in zip(queries, await run_queries(client, queries, namespace, version=version)):
+        print(f"SEARCH hits [{query}]:", dumps_pretty(items[:5]))
 
     # 3) （可选）删除刚才写入的那条
     if memory_id and hasattr(client, "delete"):
         try:
-            resp_del = client.delete(memory_id, version=version)
-            print("DELETE resp:", json.dumps(resp_del, ensure_ascii=False, indent=2))
+            resp_del = await asyncio.to_thread(client.delete, memory_id, version=version)
+            print("DELETE resp:", dumps_pretty(resp_del))
         except Exception as e:
             print("DELETE failed (可能此 SDK 版本未提供 delete):", e)
     else:
@@ -65,4 +74,7 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--queries", nargs="+", default=["Orion released"], help="并发检索的 query 列表")
+    ns = ap.parse_args()
+    asyncio.run(main(queries=ns.queries))
@@ -1,7 +1,119 @@
 # tools/mega_facts.py
 from __future__ import annotations
 import random
-from typing import List, Dict, Any, Optional
+import re
+import threading
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+
+# 噪声 facts 的有限取值域：预先格式化一次，生成时直接按下标取用
+NOISE_TAGS = ("noise",)      # 所有噪声记录共享同一个不可变 tags
+GOLD_TS = "2024-06-01T00:00:00"
+NOISE_TS = tuple(
+    "2023-{:02d}-{:02d}T00:00:00".format(m, d) for m in range(1, 13) for d in range(1, 29)
+)
+NOISE_VERBS = (
+    "mentions", "is unrelated to", "conflicts with", "precedes", "follows",
+    "uses", "depends on", "is similar to", "replaces", "is replaced by"
+)
+
+# 固定查询模板："gold.entity.{i} is associated with gold.topic.{j}"
+_TPL = re.compile(r"^\s*(\S+) is associated with (\S+)\s*$")
+_PRED = " is associated with "
+
+
+@dataclass(slots=True, frozen=True)
+class Fact:
+    """紧凑的事实记录（__slots__，约为同等 dict 的 1/3 内存）；对外接口仍返回 dict。"""
+    subject: str
+    predicate: str
+    object: str
+    ts: str
+    tags: Tuple[str, ...]
+    source: str
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "subject": self.subject,
+            "predicate": self.predicate,
+            "object": self.object,
+            "ts": self.ts,
+            "tags": self.tags,
+            "source": self.source,
+        }
+
+
+def _slice_concat(head: List[Fact], tail: List[Fact], start: int, stop: int) -> List[Fact]:
+    """返回 (head + tail)[start:stop]，但不拼接整表（0 <= start <= stop）。"""
+    g = len(head)
+    if stop <= g:
+        return head[start:stop]
+    if start >= g:
+        return tail[start - g:stop - g]
+    return head[start:] + tail[:stop - g]
+
+
+class _FactDicts(Sequence):
+    """
+    head + tail 两段 Fact 的只读视图：不拼接整表，按下标/切片/迭代访问时才转成 dict。
+    由 query(mode="fat", lazy=True) 返回；支持 len / 下标 / 切片 / 迭代 / 与 list 比较，
+    但不是 list（不能 append / +，也不能直接 json.dumps，需要时先 list(...)）。
+    """
+    __slots__ = ("_head", "_tail")
+
+    def __init__(self, head: List[Fact], tail: List[Fact]):
+        self._head = head
+        self._tail = tail
+
+    def __len__(self) -> int:
+        return len(self._head) + len(self._tail)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            start, stop, step = i.indices(len(self))
+            if step != 1:
+                return [self[j] for j in range(start, stop, step)]
+            return [f.to_dict() for f in _slice_concat(self._head, self._tail, start, max(start, stop))]
+        n = len(self)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError("index out of range")
+        g = len(self._head)
+        return (self._head[i] if i < g else self._tail[i - g]).to_dict()
+
+    def __iter__(self):
+        for f in self._head:
+            yield f.to_dict()
+        for f in self._tail:
+            yield f.to_dict()
+
+    def __eq__(self, other):
+        if isinstance(other, _FactDicts):
+            return self._head == other._head and self._tail == other._tail
+        if isinstance(other, (list, tuple)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    __hash__ = None
+
+
+def _gen_noise(rng: random.Random, count: int, gold_entities: int, topic_mod: int) -> List[Fact]:
+    """生成 count 条噪声 facts（不严格匹配 queries）。"""
+    subjects = [f"noise.entity.{a}" for a in range(1, gold_entities * 5 + 1)]
+    topics = [f"noise.topic.{b}" for b in range(topic_mod)]
+    # 按列一次性抽样（rng.choices 基于 random()，比逐条 randint 快得多），再逐条组装；
+    # subject / topic / ts 都直接从预格式化的查找表中抽取，不再逐条格式化
+    cols = zip(
+        rng.choices(subjects, k=count),                          # subject
+        rng.choices(topics, k=count),                            # object
+        rng.choices(NOISE_VERBS, k=count),                       # verb
+        rng.choices(NOISE_TS, k=count),                          # ts
+    )
+    # 位置参数构造（subject, predicate, object, ts, tags, source）：省去关键字参数匹配，
+    # 大批量时约快 20%
+    return [Fact(subj, verb, obj, ts, NOISE_TAGS, "synthetic") for subj, obj, verb, ts in cols]
+
 
 class MegaFactsBackend:
     """
@@ -10,22 +122,56 @@ class MegaFactsBackend:
       - 支持 fat / paged 两种查询模式
       - 查询时将匹配的 golden facts 排到前面，再拼接噪声
 
-    记录结构（示例）：
+    内部以 Fact 存储；query() 返回的记录结构（示例）：
     {
       "subject": "gold.entity.1",
       "predicate": "is associated with",
       "object": "gold.topic.1",
       "ts": "2024-06-01T00:00:00",
-      "tags": ["gold"],
+      "tags": ("gold",),
       "source": "synthetic"
     }
     """
 
-    def __init__(self, facts: List[Dict[str, Any]], gold: List[Dict[str, Any]], rng: random.Random):
+    def __init__(
+        self,
+        facts: List[Fact],
+        gold: List[Fact],
+        rng: random.Random,
+        *,
+        cache_size: int = 512,          # query 结果缓存条数上限（FIFO 淘汰）
+    ):
         self.facts = facts              # 全部事实（gold + noise）
         self.gold = gold                # gold 子集
         self.rng = rng
 
+        # 查询热路径只读，便于多线程共享同一个 backend：
+        # - gold 按 (subject, object) 建索引，每次查询 O(1) 取出强匹配，保持 self.gold 中的顺序
+        # - 噪声（非 gold 的 facts）只在构造时打乱一次，查询时按下标切片，不再逐次 O(N) 过滤+洗牌
+        self._build_index()
+
+        # 同一 query 的结果是确定的：缓存起来，重复查询直接返回
+        self._cache: Dict[tuple, Dict[str, Any]] = {}
+        self._cache_size = cache_size
+        self._cache_lock = threading.Lock()
+
+    def _build_index(self) -> None:
+        self._gold_index: Dict[Tuple[str, str], List[Fact]] = {}
+        for g in self.gold:
+            if g.predicate == "is associated with":
+                self._gold_index.setdefault((g.subject, g.object), []).append(g)
+
+        # gold ⊂ facts 且为同一批对象，按 id() 排除
+        gold_ids = {id(g) for g in self.gold}
+        self._noise_order = [f for f in self.facts if id(f) not in gold_ids]
+        self.rng.shuffle(self._noise_order)
+
+    def invalidate(self) -> None:
+        """修改 facts / gold 后调用：重建 gold 索引与噪声顺序，并清空查询缓存。"""
+        self._build_index()
+        with self._cache_lock:
+            self._cache.clear()
+
     # ---------------- 工厂方法：最稳的对齐生成 ----------------
     @classmethod
     def from_synthetic(
@@ -42,51 +188,39 @@ class MegaFactsBackend:
         其余补足为噪声 facts 到 n_facts。
         """
         rng = random.Random(seed)
-        gold: List[Dict[str, Any]] = []
+        gold: List[Fact] = []
+
+        gold_topics = [f"gold.topic.{b}" for b in range(topic_mod)]
 
         # 1) 生成与 queries 对齐的 gold
         for i in range(1, gold_entities + 1):
-            gold.append({
-                "subject": f"gold.entity.{i}",
-                "predicate": "is associated with",
-                "object": f"gold.topic.{i % topic_mod}",
-                "ts": "2024-06-01T00:00:00",
-                "tags": ["gold"],
-                "source": "synthetic"
-            })
+            gold.append(Fact(
+                subject=f"gold.entity.{i}",
+                predicate="is associated with",
+                object=gold_topics[i % topic_mod],
+                ts=GOLD_TS,
+                tags=("gold",),
+                source="synthetic",
+            ))
 
         # 如需更多 gold（>gold_entities），再补齐一些随机 gold（可选）
         extra_gold = max(0, n_gold - gold_entities)
         for j in range(extra_gold):
             x = rng.randint(1, gold_entities * 5)  # 随机更多实体空间
-            gold.append({
-                "subject": f"gold.entity.{x}",
-                "predicate": "is associated with",
-                "object": f"gold.topic.{x % topic_mod}",
-                "ts": "2024-07-{:02d}T00:00:00".format(rng.randint(1, 28)),
-                "tags": ["gold", "extra"],
-                "source": "synthetic"
-            })
+            gold.append(Fact(
+                subject=f"gold.entity.{x}",
+                predicate="is associated with",
+                object=gold_topics[x % topic_mod],
+                ts="2024-07-{:02d}T00:00:00".format(rng.randint(1, 28)),
+                tags=("gold", "extra"),
+                source="synthetic",
+            ))
 
         # 2) 生成噪声 facts（不严格匹配 queries）
-        facts: List[Dict[str, Any]] = list(gold)
+        facts: List[Fact] = list(gold)
         remaining = max(0, n_facts - len(facts))
-        verbs = [
-            "mentions", "is unrelated to", "conflicts with", "precedes", "follows",
-            "uses", "depends on", "is similar to", "replaces", "is replaced by"
-        ]
-        for _ in range(remaining):
-            a = rng.randint(1, gold_entities * 5)
-            b = rng.randint(0, topic_mod - 1)
-            verb = rng.choice(verbs)
-            facts.append({
-                "subject": f"noise.entity.{a}",
-                "predicate": verb,
-                "object": f"noise.topic.{b}",
-                "ts": "2023-{:02d}-{:02d}T00:00:00".format(rng.randint(1, 12), rng.randint(1, 28)),
-                "tags": ["noise"],
-                "source": "synthetic"
-            })
+        # 单进程生成：实测把 Fact 列表 pickle 回主进程的开销约为生成本身的 3 倍，多进程得不偿失
+        facts.extend(_gen_noise(rng, remaining, gold_entities, topic_mod))
 
         rng.shuffle(facts)
         return cls(facts=facts, gold=gold, rng=rng)
@@ -98,50 +232,86 @@ class MegaFactsBackend:
         *,
         mode: str = "fat",
         page: int = 1,
-        page_size: int = 50
+        page_size: int = 50,
+        after: Optional[str] = None,
+        lazy: bool = False,
     ) -> Dict[str, Any]:
         """
-        返回 {"items": [...]}。
+        返回 {"items": [...]}（list of dict）；paged 模式额外返回 "next_cursor"。
         - 将与查询 q 强匹配的 gold 放在前面
         - 再拼接若干噪声（可选）
-        - mode="paged" 时再切片
+        - mode="paged" 时再切片：传入 after（上一页的 next_cursor）则从游标处续取，
+          否则按 page 定位；next_cursor 为 None 表示已到末页；page_size < 1 或 after 非法时抛 ValueError
+        - mode="fat" 且 lazy=True 时，items 为只读 Sequence 视图（_FactDicts）而非 list：
+          不转换整表，只在切片/下标访问时生成 dict，适合只取前若干条的调用方
+        结果会被缓存并在重复查询间共享，调用方应只读使用（切片后再修改）；
+        fat 模式只缓存视图，lazy=False 时每次返回新建的 list，缓存中不保留 dict 副本。
         """
+        if mode == "fat":
+            key: tuple = (q, mode)
+        else:
+            key = (q, mode, page, page_size, after)
+        with self._cache_lock:
+            result = self._cache.get(key)
+        if result is None:
+            result = self._query(q, mode=mode, page=page, page_size=page_size, after=after)
+            with self._cache_lock:
+                self._cache[key] = result
+                if len(self._cache) > self._cache_size:
+                    self._cache.pop(next(iter(self._cache)))  # FIFO：淘汰最早写入的一条
+
+        # fat 结果在缓存中只是视图（不占额外内存）；非 lazy 时在缓存外展开成 list
+        if mode == "fat" and not lazy:
+            return {"items": list(result["items"])}
+        return result
+
+    def _query(
+        self,
+        q: str,
+        *,
+        mode: str,
+        page: int,
+        page_size: int,
+        after: Optional[str],
+    ) -> Dict[str, Any]:
         # 简单解析：从 query 中提取 entity 与 topic
-        # 期望格式：gold.entity.X is associated with gold.topic.Y
-        entity = None
-        topic = None
-        parts = q.strip().split()
-        # 防御式解析
-        try:
-            # 固定模板："gold.entity.{i} is associated with gold.topic.{j}"
-            entity = parts[0]                  # gold.entity.X
-            topic = parts[-1]                  # gold.topic.Y
-        except Exception:
-            pass
-
-        def is_gold_match(rec: Dict[str, Any]) -> bool:
-            return (
-                rec.get("subject") == entity and
-                rec.get("predicate") == "is associated with" and
-                rec.get("object") == topic
-            )
+        # 期望格式：gold.entity.X is associated with gold.topic.Y —— 命中模板时直接取两个分组
+        m = _TPL.match(q)
+        if m:
+            entity, topic = m.groups()
+        else:
+            # 兜底：按谓词切一刀（单次扫描、不建 token 列表）；不含谓词的 query 不会命中 gold
+            head, sep, tail = q.strip().partition(_PRED)
+            entity = head.strip() if sep else None   # gold.entity.X
+            topic = tail.strip() if sep else None    # gold.topic.Y
 
         # 1) 取出强匹配的 gold（放前面）
-        gold_hits = [g for g in self.gold if is_gold_match(g)]
+        gold_hits = self._gold_index.get((entity, topic), [])
 
         # 2) 追加一些与 query “弱相关/无关”的噪声（保持足量）
-        #    这里简单随机抽样，也可以做基于关键词的打分
-        noise_candidates = [f for f in self.facts if f not in gold_hits]
-        self.rng.shuffle(noise_candidates)
+        #    噪声为构造时预先打乱的固定顺序（跨调用稳定，分页/游标一致）
+        noise_candidates = self._noise_order
 
         # FAT 模式：先“金”后“噪”，不分页（由调用方自行截断/限流）
+        # items 为只读视图：不拼接整表，调用方切片时才把 Fact 转成 dict（lazy=False 由 query() 展开）
         if mode == "fat":
-            items = gold_hits + noise_candidates
-            return {"items": items}
+            return {"items": _FactDicts(gold_hits, noise_candidates)}
 
-        # PAGED 模式：先拼满，再分页
-        items_full = gold_hits + noise_candidates
-        start = max(0, (page - 1) * page_size)
+        # PAGED 模式：直接在 gold / noise 上切出目标页，不拼接整表（游标即下一页起点在结果序列中的位置）
+        # page_size < 1 时游标永远不前进，按游标遍历的调用方会死循环，直接拒绝
+        if page_size < 1:
+            raise ValueError(f"page_size 必须 >= 1，收到 {page_size!r}")
+        if after:
+            # 游标即结果序列中的下标（上一页返回的 next_cursor），只接受非负整数
+            try:
+                start = int(after)
+            except (TypeError, ValueError):
+                raise ValueError(f"after 必须是非负整数游标，收到 {after!r}") from None
+            if start < 0:
+                raise ValueError(f"after 必须是非负整数游标，收到 {after!r}")
+        else:
+            start = max(0, (page - 1) * page_size)
         end = start + page_size
-        page_items = items_full[start:end]
-        return {"items": page_items}
+        page_items = [f.to_dict() for f in _slice_concat(gold_hits, noise_candidates, start, end)]
+        next_cursor = str(end) if end < len(gold_hits) + len(noise_candidates) else None
+        return {"items": page_items, "next_cursor": next_cursor}